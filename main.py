@@ -3,7 +3,10 @@ import os
 import time
 import math
 import logging
-from datetime import datetime, timezone
+from collections import namedtuple
+import threading
+import signal as os_signal
+from concurrent.futures import ThreadPoolExecutor
 from pybit.unified_trading import HTTP
 import pandas as pd  # moved import here for clarity
 
@@ -13,6 +16,7 @@ PAIRS = [
     {"symbol": "BTCUSDT", "threshold": 0.006, "leverage": 100}
 ]
 INTERVAL = "240"           # timeframe in minutes as string (e.g. "3", "240")
+CANDLE_SECONDS = int(INTERVAL) * 60   # derived once from INTERVAL
 ROUNDING = 5               # decimals for TP/SL display
 FALLBACK = 0.90            # fallback percentage for affordability
 RISK_NORMAL = 0.1         # risk % of balance in normal mode
@@ -22,13 +26,28 @@ TP_RECOVERY = 0.004        # recovery TP pct (as fraction)
 SL_PCT = 0.005             # stop loss percent used when placing trades (0.5% default)
 QTY_SL_DIST_PCT = 0.006    # percent used to compute SL distance for qty calculation (0.6%)
 EMA_LOOKBACK = 200      
+EMA_ALPHA = 2 / (9 + 1)    # smoothing factor of EMA9 (same as pandas ewm span=9)
 recovery_mode = False  # add this near the top of the file# how many closes to request (>=9)
 
+API_MAX_RETRIES = 2        # total pybit attempts per request (first try + 1 retry on rate-limit/timestamp errors)
+API_RETRY_DELAY = 1        # seconds between pybit retries
+# Bybit v5 retCodes meaning "not enough balance" / "below minimum order value"
+INSUFFICIENT_RET_CODES = {110004, 110007, 110012, 110045, 110094}
+WARMUP_LEAD = 10           # seconds before candle close to re-open the API connection
+
 API_KEY = os.getenv("BYBIT_API_KEY")
 API_SECRET = os.getenv("BYBIT_API_SECRET")
 
 # no testnet as requested
-session = HTTP(testnet=False, api_key=API_KEY, api_secret=API_SECRET)
+session = HTTP(
+    testnet=False,
+    api_key=API_KEY,
+    api_secret=API_SECRET,
+    max_retries=API_MAX_RETRIES,
+    retry_delay=API_RETRY_DELAY,
+)
+# worker pool for independent read-only API calls
+executor = ThreadPoolExecutor(max_workers=4)
 
 # ================== LOGGING ==================
 
@@ -41,57 +60,90 @@ last_pnl = 0.0
 last_order_id = None
 last_checked_time = {p["symbol"]: 0 for p in PAIRS}
 pending_sl_check = {}
+ema_cache = {}  # symbol -> (time of last closed candle, EMA9 at that candle)
+stop_event = threading.Event()  # set by SIGINT/SIGTERM to end the main loop
+balance_cache = None  # last fetched USDT balance; cleared whenever an order is sent
 
 # ================== HELPERS ==================
 
+# one closed kline; time is the candle start in ms
+Candle = namedtuple("Candle", "time o h l c")
+
+
 def now_ts():
-    return datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M:%S UTC")
+    return time.strftime("%Y-%m-%d %H:%M:%S UTC", time.gmtime())
+
+
+def result_list(resp):
+    """Return resp["result"]["list"] of a Bybit v5 response, or [] if absent."""
+    return resp.get("result", {}).get("list") or []
+
+
+def pnl_value(entry):
+    """Return the PnL of a closed-pnl entry as float, or None if it has none."""
+    val = entry.get("closedPnl") or entry.get("realisedPnl") or entry.get("pnl")
+    return float(val) if val is not None else None
 
 
 def fetch_candles_and_ema(symbol, interval=INTERVAL, limit=EMA_LOOKBACK):
-    resp = session.get_kline(category="linear", symbol=symbol, interval=interval, limit=limit)
-    candles = list(reversed(resp["result"]["list"]))
-    closes = [float(c[4]) for c in candles]
-
-    # TradingView-accurate EMA using pandas
-    ema_series = pd.Series(closes).ewm(span=9, adjust=False).mean()
-    ema9 = ema_series.iloc[-2]  # last closed EMA
-
-    last_closed_raw = candles[-2]
-    last_closed = {
-        "time": int(last_closed_raw[0]),
-        "o": float(last_closed_raw[1]),
-        "h": float(last_closed_raw[2]),
-        "l": float(last_closed_raw[3]),
-        "c": float(last_closed_raw[4]),
-    }
-    prev_closed_raw = candles[-3]
-
-    prev_closed = {
-        "o": float(prev_closed_raw[1]),
-        "h": float(prev_closed_raw[2]),
-        "l": float(prev_closed_raw[3]),
-        "c": float(prev_closed_raw[4]),
-    }
+    cached = ema_cache.get(symbol)
+    # with a cached EMA only the in-progress + last two closed candles are needed
+    resp = session.get_kline(category="linear", symbol=symbol, interval=interval, limit=3 if cached else limit)
+    # Bybit returns newest first: [0] is the in-progress candle
+    candles = resp["result"]["list"]
+    last_time = int(candles[1][0])
+
+    if cached and cached[0] == last_time:
+        # same candle as last time → EMA unchanged
+        ema9 = cached[1]
+    elif cached and cached[0] == int(candles[2][0]):
+        # exactly one new closed candle → incremental EMA update
+        ema9 = cached[1] + EMA_ALPHA * (float(candles[1][4]) - cached[1])
+    else:
+        if cached:
+            # gap since the cached candle → rebuild from the full history
+            resp = session.get_kline(category="linear", symbol=symbol, interval=interval, limit=limit)
+            candles = resp["result"]["list"]
+            last_time = int(candles[1][0])
+
+        # closed candles only — the in-progress one never feeds the signal
+        closes = [float(c[4]) for c in reversed(candles[1:])]
+
+        # TradingView-accurate EMA using pandas
+        ema9 = pd.Series(closes).ewm(span=9, adjust=False).mean().iloc[-1]
+    ema_cache[symbol] = (last_time, ema9)
+
+    last_closed = Candle(last_time, *map(float, candles[1][1:5]))
+    prev_closed = Candle(int(candles[2][0]), *map(float, candles[2][1:5]))
     return last_closed, prev_closed, ema9
 
 
+def invalidate_balance():
+    """Forget the cached balance (call after anything that can change it)."""
+    global balance_cache
+    balance_cache = None
+
+
 def get_balance_usdt():
     """Return USDT wallet balance (or total equity fallback)."""
+    global balance_cache
+    if balance_cache is not None:
+        logging.info(f"💰 Wallet balance (cached): {balance_cache:.8f} USDT")
+        return balance_cache
     try:
         resp = session.get_wallet_balance(accountType="UNIFIED", coin="USDT")
-        if "result" in resp and "list" in resp["result"] and resp["result"]["list"]:
-            try:
-                bal = float(resp["result"]["list"][0]["coin"][0]["walletBalance"])
-                logging.info(f"💰 Wallet balance fetched: {bal:.8f} USDT")
-                return bal
-            except Exception:
-                try:
-                    bal2 = float(resp["result"]["list"][0]["totalEquity"])
-                    logging.info(f"💰 Wallet total equity fetched: {bal2:.8f} USDT")
-                    return bal2
-                except Exception:
-                    pass
+        accounts = result_list(resp)
+        if accounts:
+            account = accounts[0]
+            usdt = next((c for c in account.get("coin") or [] if c.get("coin") == "USDT"), {})
+            if usdt.get("walletBalance"):
+                balance_cache = float(usdt["walletBalance"])
+                logging.info(f"💰 Wallet balance fetched: {balance_cache:.8f} USDT")
+                return balance_cache
+            if account.get("totalEquity"):
+                balance_cache = float(account["totalEquity"])
+                logging.info(f"💰 Wallet total equity fetched: {balance_cache:.8f} USDT")
+                return balance_cache
     except Exception as e:
         logging.error(f"Error fetching balance: {e}")
 
@@ -123,14 +175,27 @@ def calc_qty(balance, entry, sl, leverage, risk_percentage, symbol):
 
     # Rounding rules
     if "BTC" in symbol:
-        # Round UP to nearest 0.001
-        qty = math.ceil(qty * 1000) / 1000.0
+        # Round UP to nearest 0.001 (in whole steps; the epsilon stops float
+        # noise such as 2.007 * 1000 = 2007.0000000000002 adding a step)
+        qty = math.ceil(qty * 1000 - 1e-9) / 1000.0
     elif "TRX" in symbol:
         qty = round(qty)
 
     return max(qty, 0.001)
 
 
+def trade_levels(signal, candle):
+    """
+    Entry at the candle close, SL at the candle's opposite extreme, TP at
+    half the SL distance or TP_NORMAL of entry, whichever is further.
+    """
+    entry = candle.c
+    direction = 1.0 if signal == "buy" else -1.0
+    sl = candle.l if signal == "buy" else candle.h
+    tp = entry + direction * max(direction * (entry - sl) / 2, entry * TP_NORMAL)
+    return entry, sl, tp
+
+
 def place_order(symbol, signal, entry, sl, tp, qty):
     """
     Place market order and save last_order_id.
@@ -140,6 +205,7 @@ def place_order(symbol, signal, entry, sl, tp, qty):
         raise ValueError("qty must be > 0")
     try:
         logging.info(f"🚀 Placing {signal.upper()} market order → Entry={entry:.8f} SL={sl:.8f} TP={tp:.8f} Qty={qty}")
+        invalidate_balance()
         resp = session.place_order(
             category="linear",
             symbol=symbol,
@@ -148,17 +214,15 @@ def place_order(symbol, signal, entry, sl, tp, qty):
             qty=str(qty),
             reduceOnly=False,
             timeInForce="IOC",
-            takeProfit=f"{round(tp, ROUNDING)}",
-            stopLoss=f"{round(sl, ROUNDING)}",
+            takeProfit=f"{tp:.{ROUNDING}f}",
+            stopLoss=f"{sl:.{ROUNDING}f}",
             positionIdx=0
         )
-        logging.info(f"✅ Order response: {resp}")
-        try:
-            if isinstance(resp, dict) and "result" in resp and resp["result"].get("orderId"):
-                last_order_id = resp["result"]["orderId"]
-                logging.info(f"🆔 Saved last_order_id = {last_order_id}")
-        except Exception:
-            pass
+        logging.info("✅ Order response: %s", resp)
+        order_id = (resp.get("result") or {}).get("orderId") if isinstance(resp, dict) else None
+        if order_id:
+            last_order_id = order_id
+            logging.info(f"🆔 Saved last_order_id = {last_order_id}")
         return resp
     except Exception as e:
         logging.error(f"Error placing order on {symbol}: {e}")
@@ -174,12 +238,11 @@ def get_pnl_for_order(order_id, symbol, search_limit=50):
     """
     try:
         resp = session.get_closed_pnl(category="linear", symbol=symbol, limit=search_limit)
-        if "result" in resp and "list" in resp["result"] and resp["result"]["list"]:
-            for t in resp["result"]["list"]:
-                if t.get("orderId") == order_id:
-                    pnl_val = t.get("closedPnl") or t.get("realisedPnl") or t.get("pnl")
-                    if pnl_val is not None:
-                        return float(pnl_val)
+        for t in result_list(resp):
+            if t.get("orderId") == order_id:
+                pnl = pnl_value(t)
+                if pnl is not None:
+                    return pnl
     except Exception as e:
         logging.error(f"Error fetching closed pnl for order_id {order_id} on {symbol}: {e}")
     return None
@@ -193,9 +256,13 @@ def get_most_recent_pnl_across_pairs():
     global last_pnl, last_order_id
     # If we have a saved last_order_id, try to fetch its pnl first (preferred).
     if last_order_id:
-        for pair in PAIRS:
-            p = pair["symbol"]
-            pnl = get_pnl_for_order(last_order_id, p, search_limit=50)
+        # per-pair lookups are independent → query all pairs at once, keep PAIRS priority
+        order_futures = [
+            (pair["symbol"], executor.submit(get_pnl_for_order, last_order_id, pair["symbol"], 50))
+            for pair in PAIRS
+        ]
+        for p, pnl_future in order_futures:
+            pnl = pnl_future.result()
             if pnl is not None:
                 last_pnl = pnl
                 logging.info(f"📊 Fetched PnL from last_order_id={last_order_id}: {pnl:.8f} USDT (symbol={p})")
@@ -207,20 +274,22 @@ def get_most_recent_pnl_across_pairs():
     latest_time = 0
     latest_symbol = None
     latest_order = None
-    for pair in PAIRS:
-        symbol = pair["symbol"]
+    pnl_futures = [
+        (pair["symbol"], executor.submit(session.get_closed_pnl, category="linear", symbol=pair["symbol"], limit=20))
+        for pair in PAIRS
+    ]
+    for symbol, pnl_future in pnl_futures:
         try:
-            resp = session.get_closed_pnl(category="linear", symbol=symbol, limit=20)
-            if "result" in resp and "list" in resp["result"] and resp["result"]["list"]:
-                t = resp["result"]["list"][0]
-                pnl_val = t.get("closedPnl") or t.get("realisedPnl") or t.get("pnl")
+            trades = result_list(pnl_future.result())
+            if trades:
+                t = trades[0]
+                pnl = pnl_value(t)
                 time_val = int(t.get("updatedTime") or t.get("createdTime") or 0)
-                order_id = t.get("orderId")
-                if pnl_val is not None and time_val > latest_time:
+                if pnl is not None and time_val > latest_time:
                     latest_time = time_val
-                    latest_trade = float(pnl_val)
+                    latest_trade = pnl
                     latest_symbol = symbol
-                    latest_order = order_id
+                    latest_order = t.get("orderId")
         except Exception as e:
             logging.error(f"Error fetching closed pnl for {symbol}: {e}")
 
@@ -235,42 +304,66 @@ def get_most_recent_pnl_across_pairs():
 
 # ================== CORE LOGIC ==================
 
+def evaluate_signal(last_closed, prev_closed, ema9, threshold):
+    """
+    Return "buy", "sell" or None for the last closed candle.
+    The candle pattern and the EMA9 side are checked together, so a returned
+    signal is already EMA-confirmed.
+    """
+    _, o, h, l, c = last_closed
+    _, po, ph, pl, pc = prev_closed
+
+    # BUY (green candle)
+    if c > o:
+        if (
+            pc > po and                     # previous candle green
+            (h - o) / o >= threshold and    # ≥ 0.4% strength
+            (h - o) > (ph - po) and         # stronger than previous
+            c > ema9
+        ):
+            return "buy"
+
+    # SELL (red candle)
+    elif c < o:
+        if (
+            pc < po and                     # previous candle red
+            (o - l) / o >= threshold and    # ≥ 0.4% strength
+            (o - l) > (po - pl) and         # stronger than previous
+            c < ema9
+        ):
+            return "sell"
+
+    return None
+
+
 def handle_symbol(symbol, threshold, leverage):
     """
     1) Fetch last closed candle + EMA9
-    2) Determine raw signal (green/red and distance threshold)
-    3) EMA9 confirmation
+    2) Determine signal (green/red, distance threshold, EMA9 side)
+    3) Log EMA9 confirmation
     4) Close positions, fetch PnL, adjust losses_count
     5) Compute qty and enforce min qty
     6) Place market order and log details
     """
     global losses_count
 
+    # 1) candles + ema (one fetch serves both the SL check and the signal)
+    last_closed, prev_closed, ema9 = fetch_candles_and_ema(symbol)
+
     # 🔁 Check SL hit from previous candle's trade
     if symbol in pending_sl_check:
         state = pending_sl_check[symbol]
+        was_buy = state["signal"] == "buy"
+        pending_sl = state["sl"]
 
-        last_closed, _, _ = fetch_candles_and_ema(symbol)
-        nh = last_closed["h"]
-        nl = last_closed["l"]
-
-        sl_hit = (
-            (state["signal"] == "buy" and nl <= state["sl"]) or
-            (state["signal"] == "sell" and nh >= state["sl"])
-        )
+        # long stops out on the low, short on the high
+        sl_hit = last_closed.l <= pending_sl if was_buy else last_closed.h >= pending_sl
 
         if sl_hit:
             logging.warning("🔥 SL hit on next candle — reversing trade")
 
-            signal = "sell" if state["signal"] == "buy" else "buy"
-            entry = last_closed["c"]
-
-            if signal == "buy":
-                sl = last_closed["l"]
-                tp = entry + max((entry - sl) / 2, entry * 0.004)
-            else:
-                sl = last_closed["h"]
-                tp = entry - max((sl - entry) / 2, entry * 0.004)
+            signal = "sell" if was_buy else "buy"
+            entry, sl, tp = trade_levels(signal, last_closed)
 
             balance = get_balance_usdt()
             qty = calc_qty(balance, entry, sl, leverage, RISK_NORMAL, symbol)
@@ -289,85 +382,52 @@ def handle_symbol(symbol, threshold, leverage):
         else:
             # SL not hit → clear check
             del pending_sl_check[symbol]
-    # 1) candles + ema
-    last_closed, prev_closed, ema9 = fetch_candles_and_ema(symbol)
-    ts = datetime.utcfromtimestamp(last_closed["time"] / 1000).strftime("%Y-%m-%d %H:%M")
-    o, h, l, c = last_closed["o"], last_closed["h"], last_closed["l"], last_closed["c"]
-    logging.info(f"{symbol} | {ts} | Close={c:.8f} | EMA9={ema9:.8f}")
+
+    ts = time.strftime("%Y-%m-%d %H:%M", time.gmtime(last_closed.time // 1000))
+    logging.info(f"{symbol} | {ts} | Close={last_closed.c:.8f} | EMA9={ema9:.8f}")
 
     # skip if same candle already processed
-    if last_closed["time"] == last_checked_time[symbol]:
+    if last_closed.time == last_checked_time[symbol]:
         return False
-    last_checked_time[symbol] = last_closed["time"]
-
-    # 2) raw signal detection
-    po, ph, pl, pc = (
-    prev_closed["o"],
-    prev_closed["h"],
-    prev_closed["l"],
-    prev_closed["c"],
-    )
-    
-    signal = None
-
-# BUY
-    if (
-        c > o and                       # green candle
-        pc > po and                     # previous candle green
-        (h - o) / o >= threshold and    # ≥ 0.4% strength
-        (h - o) > (ph - po) and         # stronger than previous
-        c > ema9
-    ):
-        signal = "buy"
-
-# SELL
-    elif (
-        c < o and                       # red candle
-        pc < po and                     # previous candle red
-        (o - l) / o >= threshold and    # ≥ 0.4% strength
-        (o - l) > (po - pl) and         # stronger than previous
-        c < ema9
-    ):
-        signal = "sell"
+    last_checked_time[symbol] = last_closed.time
 
+    # 2) + 3) raw signal with EMA9 confirmation (single pass)
+    signal = evaluate_signal(last_closed, prev_closed, ema9, threshold)
     if not signal:
         logging.info(f"❌ {symbol}: No raw signal — skipping.")
         return False
 
-    # 3) EMA confirmation
     if signal == "buy":
-        if not (c > ema9):
-            logging.info(f"❌ {symbol}: Buy rejected — Close={c:.8f} not above EMA9={ema9:.8f}")
-            return False
         logging.info(f"✅ {symbol}: Buy confirmed → Close above EMA9.")
     else:
-        if not (c < ema9):
-            logging.info(f"❌ {symbol}: Sell rejected — Close={c:.8f} not below EMA9={ema9:.8f}")
-            return False
         logging.info(f"✅ {symbol}: Sell confirmed → Close below EMA9.")
 
     # 4) Close positions and check PnL
     logging.info(f"📉 {symbol}: Confirmed {signal.upper()} signal → closing all positions before new trade.")
-    for p in PAIRS:
+    # position reads are independent → fetch every pair concurrently, close serially
+    position_futures = [
+        (p, executor.submit(session.get_positions, category="linear", symbol=p["symbol"]))
+        for p in PAIRS
+    ]
+    for p, pos_future in position_futures:
         try:
-            pos_resp = session.get_positions(category="linear", symbol=p["symbol"])
-            if "result" in pos_resp and "list" in pos_resp["result"]:
-                for pos in pos_resp["result"]["list"]:
-                    size = float(pos.get("size", 0) or 0)
-                    side = pos.get("side", "")
-                    if size > 0:
-                        close_side = "Sell" if side.lower() == "buy" else "Buy"
-                        logging.info(f"🔻 Closing {side} position on {p['symbol']} size={size}")
-                        session.place_order(
-                            category="linear",
-                            symbol=p["symbol"],
-                            side=close_side,
-                            orderType="Market",
-                            qty=str(size),
-                            reduceOnly=True,
-                            timeInForce="IOC"
-                        )
-                        time.sleep(1)
+            for pos in result_list(pos_future.result()):
+                size = float(pos.get("size", 0) or 0)
+                side = pos.get("side", "")
+                if size > 0:
+                    close_side = "Sell" if side.lower() == "buy" else "Buy"
+                    logging.info(f"🔻 Closing {side} position on {p['symbol']} size={size}")
+                    invalidate_balance()
+                    session.place_order(
+                        category="linear",
+                        symbol=p["symbol"],
+                        side=close_side,
+                        orderType="Market",
+                        qty=str(size),
+                        reduceOnly=True,
+                        timeInForce="IOC"
+                    )
+                    time.sleep(1)
         except Exception as e:
             logging.error(f"Error while closing positions for {p['symbol']}: {e}")
     
@@ -389,15 +449,7 @@ def handle_symbol(symbol, threshold, leverage):
     # 5) build trade params
     risk_pct = RISK_NORMAL
     
-    entry = last_closed["c"]
-    
-    if signal == "buy":
-        sl = last_closed["l"]
-        tp = entry + max((entry - sl) / 2, entry * 0.004)
-        
-    else:  # sell
-        sl = last_closed["h"]
-        tp = entry - max((sl - entry) / 2, entry * 0.004)
+    entry, sl, tp = trade_levels(signal, last_closed)
         
     balance = get_balance_usdt()
     qty =  calc_qty(balance, entry, sl, leverage, risk_pct, symbol)
@@ -434,9 +486,12 @@ def handle_symbol(symbol, threshold, leverage):
         }
         return True
     except Exception as e:
-        msg = str(e).lower()
         logging.error(f"❌ {symbol} order failed: {e}")
-        if any(x in msg for x in ["insufficient", "not enough", "minimum", "exceeds minimum"]):
+        # pybit's InvalidRequestError carries Bybit's retCode as status_code;
+        # the message scan covers errors without one
+        if getattr(e, "status_code", None) in INSUFFICIENT_RET_CODES or any(
+            x in str(e).lower() for x in ["insufficient", "not enough", "minimum", "exceeds minimum"]
+        ):
             logging.warning(f"⚠️ {symbol} trade insufficient or minimum error.")
             return "INSUFFICIENT"
         return False
@@ -444,32 +499,55 @@ def handle_symbol(symbol, threshold, leverage):
 
 # ================== SCHEDULER ==================
 
-def seconds_until_next_candle(interval_minutes):
-    now = datetime.now(timezone.utc)
-    candle_seconds = int(interval_minutes) * 60
-    seconds_into_cycle = (now.hour * 3600 + now.minute * 60 + now.second) % candle_seconds
-    wait = candle_seconds - seconds_into_cycle
-    if wait <= 0:
-        wait += candle_seconds
-    return wait
+def next_candle_deadline():
+    """Return the epoch time of the next candle close (UTC aligned)."""
+    now = time.time()
+    return now - (now % CANDLE_SECONDS) + CANDLE_SECONDS
+
+
+def request_stop(signum, frame):
+    """Signal handler: wake the scheduler and stop after the current step."""
+    logging.info(f"🛑 Received signal {signum} — stopping.")
+    stop_event.set()
 
 
 def main():
+    os_signal.signal(os_signal.SIGINT, request_stop)
+    os_signal.signal(os_signal.SIGTERM, request_stop)
     logging.info("🤖 Bot started — BTC priority, TRX fallback if insufficient funds")
-    while True:
+
+    # PAIRS is static config → resolve and validate it once, not every candle
+    btc_pair = next((p for p in PAIRS if p["symbol"] == "BTCUSDT"), None)
+    trx_pair = next((p for p in PAIRS if p["symbol"] == "TRXUSDT"), None)
+    if not btc_pair:
+        logging.error("BTCUSDT pair missing from PAIRS — cannot continue.")
+        return  # stop the bot
+    if not trx_pair:
+        logging.warning("TRXUSDT pair missing from PAIRS — TRX fallback disabled.")
+
+    deadline = next_candle_deadline()
+    while not stop_event.is_set():
         try:
-            wait = seconds_until_next_candle(int(INTERVAL))
-            logging.info(f"⏳ Waiting {wait}s for next {INTERVAL}m candle close...")
-            time.sleep(wait + 1)
-
-            btc_pair = next((p for p in PAIRS if p["symbol"] == "BTCUSDT"), None)
-            trx_pair = next((p for p in PAIRS if p["symbol"] == "TRXUSDT"), None)
-            if not btc_pair:
-                logging.error("BTCUSDT pair missing from PAIRS — cannot continue.")
-                return  # stop the bot
-            if not trx_pair:
-                logging.warning("TRXUSDT pair missing from PAIRS — TRX fallback disabled.")
-                
+            # absolute deadline: time spent handling a candle doesn't shift the next wake-up
+            wait = deadline - time.time()
+            if wait < 0:
+                deadline = next_candle_deadline()
+                wait = deadline - time.time()
+            logging.info("⏳ Waiting %ds for next %sm candle close...", wait, INTERVAL)
+            if wait > WARMUP_LEAD:
+                if stop_event.wait(wait - WARMUP_LEAD):
+                    break
+                # the keep-alive connection has likely idled out → reconnect now, not on the kline call
+                try:
+                    session.get_server_time()
+                except Exception as e:
+                    logging.warning(f"Connection warm-up failed: {e}")
+            if stop_event.wait(deadline - time.time() + 1):
+                break
+            logging.info("⏰ Woke %.3fs after candle close", time.time() - deadline)
+            deadline += CANDLE_SECONDS
+            invalidate_balance()  # fresh balance each candle; reused across BTC → TRX fallback
+
             btc_result = handle_symbol(btc_pair["symbol"], btc_pair["threshold"], btc_pair["leverage"])
             if btc_result == "INSUFFICIENT" or btc_result is False:
                 if trx_pair:  # only fallback if trx_pair exists
@@ -479,12 +557,10 @@ def main():
                         logging.warning("⚠️ TRX fallback also insufficient.")
                 else:
                     logging.warning("⚠️ TRX fallback disabled — TRXUSDT not in PAIRS.")
-        except KeyboardInterrupt:
-            logging.info("🛑 Stopped manually by user.")
-            break
         except Exception as e:
             logging.error(f"Unhandled error in main loop: {e}")
-            time.sleep(5)
+            stop_event.wait(5)
+    logging.info("🛑 Stopped manually by user.")
 
 
 if __name__ == "__main__":